@@ -0,0 +1,12 @@
+-- Columnas de métricas de ejecución (taskman-back/taskman/runner.py) en TaskExecutions.
+-- Necesaria en bases de datos creadas antes de estas columnas; se puede ejecutar varias veces.
+IF COL_LENGTH('TaskExecutions', 'WallTimeMs') IS NULL
+    ALTER TABLE TaskExecutions ADD WallTimeMs INT NULL;
+IF COL_LENGTH('TaskExecutions', 'CpuTimeMs') IS NULL
+    ALTER TABLE TaskExecutions ADD CpuTimeMs INT NULL;
+IF COL_LENGTH('TaskExecutions', 'PeakRssKb') IS NULL
+    ALTER TABLE TaskExecutions ADD PeakRssKb INT NULL;
+IF COL_LENGTH('TaskExecutions', 'ImportTimeMs') IS NULL
+    ALTER TABLE TaskExecutions ADD ImportTimeMs INT NULL;
+IF COL_LENGTH('TaskExecutions', 'ExitCode') IS NULL
+    ALTER TABLE TaskExecutions ADD ExitCode INT NULL;
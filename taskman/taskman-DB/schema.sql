@@ -13,5 +13,12 @@ CREATE TABLE TaskExecutions (
     ExecutionTime DATETIME NOT NULL DEFAULT GETDATE(),
     Status NVARCHAR(50) NOT NULL, -- 'pending', 'success', 'error'
     Log NVARCHAR(MAX) NULL,
-    Entorno NVARCHAR(10) NOT NULL -- 'Test' o 'Prod'
+    Entorno NVARCHAR(10) NOT NULL, -- 'Test' o 'Prod'
+    WallTimeMs INT NULL, -- Métricas del lanzador taskman/runner.py
+    CpuTimeMs INT NULL,
+    PeakRssKb INT NULL,
+    ImportTimeMs INT NULL,
+    ExitCode INT NULL
 );
+
+-- Bases de datos existentes: aplicar migrations/001_execution_metrics.sql
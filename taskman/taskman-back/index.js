@@ -1,13 +1,14 @@
 const express = require('express');
 const sql = require('mssql');
 const bodyParser = require('body-parser');
-const { exec } = require('child_process');
+const { execFile } = require('child_process');
 const dbConfig = require('./config/db.config');
 const path = require('path');
 const nodemailer = require('nodemailer');
 const cors = require('cors');
 const multer = require('multer');
 const fs = require('fs');
+const os = require('os');
 
 const app = express();
 app.use(bodyParser.json());
@@ -97,13 +98,17 @@ app.post('/api/tasks/:id/execute', async (req, res) => {
     const envFile = entorno === 'Prod' ? '.env-scripts' : '.env-scripts-test';
     const env = { ...process.env, ENV_SCRIPTS_FILE: envFile };
 
-    exec(`python "${scriptPath}"`, { env }, async (error, stdout, stderr) => {
+    runPythonScript(scriptPath, env, async (error, stdout, stderr, metrics) => {
       const status = error ? 'error' : 'success';
       const log = error ? stderr : stdout;
-      await sql.query`
-        INSERT INTO TaskExecutions (TaskId, Status, Log, Entorno)
-        VALUES (${req.params.id}, ${status}, ${log}, ${entorno})
-      `;
+      try {
+        await sql.query`
+          INSERT INTO TaskExecutions (TaskId, Status, Log, Entorno, WallTimeMs, CpuTimeMs, PeakRssKb, ImportTimeMs, ExitCode)
+          VALUES (${req.params.id}, ${status}, ${log}, ${entorno}, ${metrics.wall_time_ms}, ${metrics.cpu_time_ms}, ${metrics.peak_rss_kb}, ${metrics.import_time_ms}, ${metrics.exit_code})
+        `;
+      } catch (err) {
+        return res.status(500).json({ error: err.message, status, log });
+      }
       if (status === 'error') {
         //await sendErrorEmail(scriptName, log);
       }
@@ -150,17 +155,19 @@ app.post('/api/scripts/upload', upload.single('scriptFile'), async (req, res) =>
       fs.unlinkSync(destPath);
     }
     fs.renameSync(req.file.path, destPath);
-    // Generar requirements.txt y pip install
-    try {
-      const { execSync } = require('child_process');
-      execSync(`pipreqs "${path.join(__dirname, 'scripts')}" --force`, { stdio: 'inherit' });
-      const reqPath = path.join(__dirname, 'scripts', 'requirements.txt');
-      if (fs.existsSync(reqPath)) {
-        execSync(`pip install -r "${reqPath}"`, { stdio: 'inherit' });
+    // Preparar en segundo plano el entorno del script (solo se reconstruye si cambian sus requirements)
+    execFile('python', ['-m', 'taskman.envs', 'prepare', destPath], { cwd: __dirname }, (error, stdout, stderr) => {
+      if (error) {
+        console.log(`[DEBUG] Error preparando el entorno de ${req.file.originalname}:`, stderr);
+      } else {
+        console.log(`[DEBUG] Entorno preparado: ${stdout.trim()}`);
       }
-    } catch (err) {
-      return res.status(500).json({ error: 'Error generando o instalando requirements', details: err.message });
-    }
+      // Borrar los entornos que ya no usa ningún script (p. ej. el de la versión anterior de este)
+      execFile('python', ['-m', 'taskman.envs', 'gc'], { cwd: __dirname }, (gcError, gcStdout, gcStderr) => {
+        if (gcError) console.log('[DEBUG] Error limpiando entornos de scripts:', gcStderr || gcError.message);
+        else if (gcStdout.trim()) console.log(`[DEBUG] ${gcStdout.trim()}`);
+      });
+    });
     return res.status(200).json({ message: 'Archivo subido correctamente' });
   } catch (err) {
     res.status(500).json({ error: err.message });
@@ -308,14 +315,18 @@ setInterval(async () => {
         const envFile = entorno === 'Prod' ? '../.env-scripts' : '../.env-scripts-test';
         const env = { ...process.env, ENV_SCRIPTS_FILE: envFile };
         console.log(`[DEBUG] Ejecutando script para tarea ${task.Id} (${task.Name}): ${scriptPath}`);
-        exec(`python "${scriptPath}"`, { env }, async (error, stdout, stderr) => {
+        runPythonScript(scriptPath, env, async (error, stdout, stderr, metrics) => {
           const status = error ? 'error' : 'success';
           const log = error ? stderr : stdout;
-          console.log(`[DEBUG] Resultado ejecución tarea ${task.Id} (${task.Name}): status=${status}`);
-          await sql.query`
-            INSERT INTO TaskExecutions (TaskId, ExecutionTime, Status, Log, Entorno)
-            VALUES (${task.Id}, ${now}, ${status}, ${log}, ${entorno})
-          `;
+          console.log(`[DEBUG] Resultado ejecución tarea ${task.Id} (${task.Name}): status=${status}, duración=${metrics.wall_time_ms}ms`);
+          try {
+            await sql.query`
+              INSERT INTO TaskExecutions (TaskId, ExecutionTime, Status, Log, Entorno, WallTimeMs, CpuTimeMs, PeakRssKb, ImportTimeMs, ExitCode)
+              VALUES (${task.Id}, ${now}, ${status}, ${log}, ${entorno}, ${metrics.wall_time_ms}, ${metrics.cpu_time_ms}, ${metrics.peak_rss_kb}, ${metrics.import_time_ms}, ${metrics.exit_code})
+            `;
+          } catch (err) {
+            console.log(`[DEBUG] Error guardando la ejecución de la tarea ${task.Id} (${task.Name}):`, err.message);
+          }
           if (status === 'error') {
             console.log(`[DEBUG] Error al ejecutar tarea ${task.Id} (${task.Name}):`, log);
             //await sendErrorEmail(task.ScriptName, log);
@@ -329,6 +340,35 @@ setInterval(async () => {
   }
 }, 60000); // Cada minuto
 
+// Ejecutar un script Python a través del lanzador instrumentado (taskman/runner.py),
+// usando el entorno virtual cacheado del script (taskman/envs.py).
+// Las métricas (tiempo, CPU, memoria, imports, código de salida) se leen del JSON que deja el lanzador.
+function runPythonScript(scriptPath, env, callback) {
+  const metricsFile = path.join(os.tmpdir(), `taskman-metrics-${Date.now()}-${Math.random().toString(36).slice(2)}.json`);
+  const args = ['-m', 'taskman.runner', 'run', scriptPath, '--metrics-file', metricsFile];
+  execFile('python', args, { env, cwd: __dirname }, (error, stdout, stderr) => {
+    // Sin fichero de métricas el script no llegó a ejecutarse (entorno no listo, python no encontrado...):
+    // no hay código de salida del script que guardar
+    let metrics = {};
+    try {
+      metrics = JSON.parse(fs.readFileSync(metricsFile, 'utf8'));
+    } catch (err) {
+      console.log('[DEBUG] No se pudieron leer las métricas de ejecución:', err.message);
+    } finally {
+      fs.rmSync(metricsFile, { force: true });
+    }
+    metrics = {
+      wall_time_ms: null,
+      cpu_time_ms: null,
+      peak_rss_kb: null,
+      import_time_ms: null,
+      exit_code: null,
+      ...metrics
+    };
+    callback(error, stdout, stderr || (error ? error.message : ''), metrics);
+  });
+}
+
 // Enviar email en caso de error
 async function sendErrorEmail(scriptName, log) {
   // Configura tu transporte SMTP real aquí
@@ -352,7 +392,16 @@ ${log}`
   });
 }
 
+// Construir al arrancar los entornos que falten de los scripts existentes (las ejecuciones no instalan nada)
+function prepareAllScriptEnvs() {
+  execFile('python', ['-m', 'taskman.envs', 'prepare-all'], { cwd: __dirname }, (error, stdout, stderr) => {
+    if (error) console.log('[DEBUG] Error preparando entornos de scripts:', stderr || error.message);
+    if (stdout.trim()) console.log(`[DEBUG] Entornos de scripts:\n${stdout.trim()}`);
+  });
+}
+
 const PORT = 3001;
 app.listen(PORT, () => {
   console.log(`Taskman backend escuchando en http://localhost:${PORT}`);
+  prepareAllScriptEnvs();
 });
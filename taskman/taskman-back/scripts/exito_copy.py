@@ -1,9 +1,13 @@
+# Usa los helpers de taskman (taskman/helpers.py). Ejecutar desde /taskman-back con:
+#   python -m taskman.runner run scripts/exito_copy.py
+# o directamente con taskman-back en el PYTHONPATH:
+#   PYTHONPATH=. python scripts/exito_copy.py
 import sys
 import datetime
-import requests
+from taskman.helpers import get_session
 
 try:
-    response = requests.get('https://api.github.com')
+    response = get_session().get('https://api.github.com')
     print(f"Status code: {response.status_code}")
     print(f"Ejecución exitosa a las {datetime.datetime.now()}")
     sys.exit(0)
@@ -0,0 +1,7 @@
+"""Utilidades compartidas de Taskman para los scripts Python del backend."""
+
+import os
+
+# Directorio raíz de /taskman-back
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+SCRIPTS_DIR = os.path.join(BACKEND_DIR, 'scripts')
@@ -0,0 +1,45 @@
+"""Proceso hijo del lanzador: ejecuta el script midiendo el tiempo de sus imports.
+
+Importa lo mínimo posible para no adelantar imports del script y falsear la medida.
+
+Uso interno:
+    python -m taskman._bootstrap <script> <fichero_tiempo_imports>
+"""
+
+import builtins
+import os
+import runpy
+import sys
+import time
+
+
+def main(script_path, import_time_file):
+    original_import = builtins.__import__
+    state = {'depth': 0, 'total': 0.0}
+
+    def timed_import(*args, **kwargs):
+        # Solo se cronometra el import más externo para no contar dos veces
+        if state['depth']:
+            return original_import(*args, **kwargs)
+        state['depth'] += 1
+        start = time.perf_counter()
+        try:
+            return original_import(*args, **kwargs)
+        finally:
+            state['total'] += time.perf_counter() - start
+            state['depth'] -= 1
+
+    # Igual que 'python script.py': el directorio del script va primero en sys.path
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script_path)))
+    sys.argv = [script_path]
+    builtins.__import__ = timed_import
+    try:
+        runpy.run_path(script_path, run_name='__main__')
+    finally:
+        builtins.__import__ = original_import
+        with open(import_time_file, 'w') as f:
+            f.write(str(state['total']))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1], sys.argv[2])
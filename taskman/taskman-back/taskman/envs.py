@@ -0,0 +1,370 @@
+"""Entornos virtuales por script, cacheados por el hash de sus requirements.
+
+Cada script obtiene sus dependencias a partir de sus imports, más las que
+declare en 'scripts/<nombre>.requirements.txt' si existe. El entorno se guarda en
+'.venvs/<hash>' y solo se reconstruye cuando cambia ese hash.
+
+Uso:
+    python -m taskman.envs requirements scripts/mi_script.py
+    python -m taskman.envs prepare scripts/mi_script.py [...]
+    python -m taskman.envs prepare-all
+    python -m taskman.envs gc
+"""
+
+import argparse
+import ast
+import contextlib
+import glob
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from taskman import BACKEND_DIR, SCRIPTS_DIR
+
+ENVS_DIR = os.path.join(BACKEND_DIR, '.venvs')
+PIP_CACHE_DIR = os.path.join(ENVS_DIR, 'pip-cache')
+# Versiones fijadas para todo el backend; se aplican a los paquetes que use cada script
+PINNED_REQUIREMENTS_FILE = os.path.join(BACKEND_DIR, 'requirements.txt')
+READY_MARKER = '.taskman-ready'
+# Un '<hash>.lock' más antiguo que esto es de una construcción que murió sin liberarlo
+BUILD_LOCK_TIMEOUT = 60 * 60
+ERROR_LOG_LINES = 20
+
+
+class EnvNotReadyError(RuntimeError):
+    """El entorno del script todavía no está construido."""
+
+
+# Imports cuyo nombre no coincide con el paquete de PyPI
+IMPORT_TO_PACKAGE = {
+    'bs4': 'beautifulsoup4',
+    'cv2': 'opencv-python',
+    'dateutil': 'python-dateutil',
+    'dotenv': 'python-dotenv',
+    'jwt': 'PyJWT',
+    'MySQLdb': 'mysqlclient',
+    'PIL': 'Pillow',
+    'sklearn': 'scikit-learn',
+    'yaml': 'PyYAML',
+}
+# Dependencias de los helpers de taskman (taskman.helpers)
+TASKMAN_PACKAGES = ['requests']
+# Driver de SQL Server (DB_DRIVER=mssql, el valor por defecto) para db_connection/get_pool
+TASKMAN_DB_PACKAGES = ['pyodbc']
+TASKMAN_DB_HELPERS = {'db_connection', 'get_pool'}
+
+
+def _normalize(name):
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+def _requirement_name(line):
+    return _normalize(re.split(r'[<>=!~;\[ ]', line, 1)[0])
+
+
+def _read_requirements(path):
+    with open(path, encoding='utf-8') as f:
+        lines = [line.split('#', 1)[0].strip() for line in f]
+    return [line for line in lines if line]
+
+
+def _parse_imports(script_path):
+    """Devuelve (módulos importados, si el script usa los helpers de base de datos)."""
+    # En bytes, para que ast respete la declaración '# -*- coding: ... -*-' del script
+    with open(script_path, 'rb') as f:
+        tree = ast.parse(f.read(), filename=script_path)
+    modules = set()
+    uses_db = False
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.update(alias.name.split('.')[0] for alias in node.names)
+            # 'import taskman.helpers': no se sabe qué se usa, se asume que la base de datos también
+            uses_db = uses_db or any(alias.name == 'taskman.helpers' for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.add(node.module.split('.')[0])
+            names = {alias.name for alias in node.names}
+            if node.module == 'taskman.helpers':
+                uses_db = uses_db or bool(names & (TASKMAN_DB_HELPERS | {'*'}))
+            elif node.module == 'taskman':
+                uses_db = uses_db or bool(names & {'helpers', '*'})
+    return modules, uses_db
+
+
+def _local_modules(script_dir):
+    """Módulos que se resuelven localmente y no hay que instalar."""
+    local = {'taskman'}
+    for entry in os.listdir(script_dir):
+        name, ext = os.path.splitext(entry)
+        if ext == '.py' or os.path.isdir(os.path.join(script_dir, entry)):
+            local.add(name)
+    return local
+
+
+def script_requirements(script_path):
+    """Devuelve la lista ordenada de requirements de un script.
+
+    Las líneas de 'scripts/<nombre>.requirements.txt' se añaden a las
+    deducidas de los imports y sustituyen a las del mismo paquete.
+    """
+    pinned = {}
+    if os.path.exists(PINNED_REQUIREMENTS_FILE):
+        pinned = {_requirement_name(line): line for line in _read_requirements(PINNED_REQUIREMENTS_FILE)}
+
+    local = _local_modules(os.path.dirname(os.path.abspath(script_path)))
+    modules, uses_db = _parse_imports(script_path)
+    requirements = {}
+    for module in modules:
+        if module == 'taskman':
+            packages = TASKMAN_PACKAGES + (TASKMAN_DB_PACKAGES if uses_db else [])
+        elif module in sys.stdlib_module_names or module in local:
+            continue
+        else:
+            packages = [IMPORT_TO_PACKAGE.get(module, module)]
+        for package in packages:
+            requirements[_normalize(package)] = pinned.get(_normalize(package), package)
+
+    extra = os.path.splitext(script_path)[0] + '.requirements.txt'
+    if os.path.exists(extra):
+        for line in _read_requirements(extra):
+            requirements[_requirement_name(line)] = line
+    return sorted(requirements.values(), key=_requirement_name)
+
+
+def requirements_hash(requirements):
+    """Hash de los requirements y de la versión del intérprete base."""
+    digest = hashlib.sha256()
+    digest.update(f'{sys.implementation.name}-{sys.version_info.major}.{sys.version_info.minor}-{sys.platform}\n'.encode())
+    for line in requirements:
+        digest.update(line.encode() + b'\n')
+    return digest.hexdigest()[:16]
+
+
+def _env_python(env_dir):
+    if os.name == 'nt':
+        return os.path.join(env_dir, 'Scripts', 'python.exe')
+    return os.path.join(env_dir, 'bin', 'python')
+
+
+def _lock_path(env_hash):
+    return os.path.join(ENVS_DIR, env_hash + '.lock')
+
+
+def _error_path(env_hash):
+    return os.path.join(ENVS_DIR, env_hash + '.error')
+
+
+def _acquire_lock(env_hash):
+    """Crea '<hash>.lock' de forma exclusiva; devuelve False si otra construcción lo tiene."""
+    os.makedirs(ENVS_DIR, exist_ok=True)
+    path = _lock_path(env_hash)
+    for _ in range(2):
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                stale = time.time() - os.path.getmtime(path) > BUILD_LOCK_TIMEOUT
+            except OSError:
+                continue  # Se acaba de liberar
+            if not stale:
+                return False
+            os.remove(path)
+            continue
+        with os.fdopen(fd, 'w') as f:
+            f.write(str(os.getpid()))
+        return True
+    return False
+
+
+def _release_lock(env_hash):
+    try:
+        os.remove(_lock_path(env_hash))
+    except FileNotFoundError:
+        pass
+
+
+def is_building(env_hash):
+    return os.path.exists(_lock_path(env_hash))
+
+
+def build_error(env_hash):
+    """Últimas líneas de la salida de la construcción fallida, o None."""
+    try:
+        with open(_error_path(env_hash), encoding='utf-8', errors='replace') as f:
+            lines = f.read().strip().splitlines()
+    except FileNotFoundError:
+        return None
+    return '\n'.join(lines[-ERROR_LOG_LINES:])
+
+
+def _run_logged(cmd):
+    """Ejecuta un comando mostrando su salida por stderr; si falla la adjunta a la excepción."""
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            encoding='utf-8', errors='replace')
+    sys.stderr.write(result.stdout)
+    if result.returncode:
+        raise subprocess.CalledProcessError(result.returncode, cmd, output=result.stdout)
+
+
+def _build_env(env_dir, requirements):
+    """Crea el entorno en un directorio temporal y lo mueve a su sitio al terminar."""
+    os.makedirs(ENVS_DIR, exist_ok=True)
+    build_dir = tempfile.mkdtemp(prefix='build-', dir=ENVS_DIR)
+    try:
+        _run_logged([sys.executable, '-m', 'venv', build_dir])
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+            f.write('\n'.join(requirements) + '\n')
+            requirements_file = f.name
+        try:
+            _run_logged([
+                _env_python(build_dir), '-m', 'pip', 'install', '--disable-pip-version-check',
+                '--cache-dir', PIP_CACHE_DIR, '-r', requirements_file,
+            ])
+        finally:
+            os.remove(requirements_file)
+        with open(os.path.join(build_dir, READY_MARKER), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(requirements) + '\n')
+        try:
+            os.replace(build_dir, env_dir)
+        except OSError:
+            # Otro proceso construyó el mismo entorno a la vez
+            if not os.path.exists(os.path.join(env_dir, READY_MARKER)):
+                raise
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+
+def ensure_env(script_path, build=True):
+    """Devuelve el intérprete con el que ejecutar el script.
+
+    Los scripts sin dependencias externas usan el intérprete actual. Si el
+    entorno no existe y build es False devuelve None. Cada entorno lo
+    construye un solo proceso a la vez: si otro lo está haciendo lanza
+    EnvNotReadyError. Si pip falla, su salida queda en '.venvs/<hash>.error'.
+    """
+    requirements = script_requirements(script_path)
+    if not requirements:
+        return sys.executable
+    env_hash = requirements_hash(requirements)
+    env_dir = os.path.join(ENVS_DIR, env_hash)
+    if os.path.exists(os.path.join(env_dir, READY_MARKER)):
+        return _env_python(env_dir)
+    if not build:
+        return None
+    if not _acquire_lock(env_hash):
+        raise EnvNotReadyError('Ya hay otra construcción de este entorno en curso.')
+    try:
+        if not os.path.exists(os.path.join(env_dir, READY_MARKER)):
+            try:
+                _build_env(env_dir, requirements)
+            except subprocess.CalledProcessError as e:
+                with open(_error_path(env_hash), 'w', encoding='utf-8') as f:
+                    f.write(e.output or str(e))
+                raise
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(_error_path(env_hash))
+    finally:
+        _release_lock(env_hash)
+    return _env_python(env_dir)
+
+
+def prepare_in_background(script_path):
+    """Lanza 'prepare' para el script en un proceso independiente."""
+    kwargs = {'start_new_session': True} if os.name != 'nt' else {}
+    subprocess.Popen(
+        [sys.executable, '-m', 'taskman.envs', 'prepare', os.path.abspath(script_path)],
+        cwd=BACKEND_DIR, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        **kwargs,
+    )
+
+
+def require_env(script_path):
+    """Intérprete del script para ejecutarlo, sin instalar nada en este proceso.
+
+    Si el entorno no está listo lanza EnvNotReadyError: con la salida de pip si
+    la última construcción falló, o lanzando antes la construcción en segundo
+    plano si no hay ninguna en curso.
+    """
+    python = ensure_env(script_path, build=False)
+    if python is not None:
+        return python
+    env_hash = requirements_hash(script_requirements(script_path))
+    error = build_error(env_hash)
+    if error is not None:
+        raise EnvNotReadyError(
+            'Falló la construcción del entorno del script. Corrige sus requirements y vuelve a subirlo '
+            f"o ejecuta 'python -m taskman.envs prepare'. Salida de pip:\n{error}"
+        )
+    if not is_building(env_hash):
+        prepare_in_background(script_path)
+    raise EnvNotReadyError(
+        'El entorno del script aún no está preparado; se está construyendo en segundo plano. '
+        'Vuelve a ejecutarlo en unos minutos.'
+    )
+
+
+def _all_scripts():
+    return sorted(glob.glob(os.path.join(SCRIPTS_DIR, '*.py')))
+
+
+def collect_garbage():
+    """Borra los entornos que ya no corresponden a ningún script."""
+    in_use = set()
+    for script in _all_scripts():
+        requirements = script_requirements(script)
+        if requirements:
+            in_use.add(requirements_hash(requirements))
+    removed = []
+    if os.path.isdir(ENVS_DIR):
+        for entry in os.listdir(ENVS_DIR):
+            path = os.path.join(ENVS_DIR, entry)
+            if entry.endswith('.error') and entry[:-len('.error')] not in in_use:
+                os.remove(path)
+                continue
+            # Los 'build-*' son construcciones en curso de otro proceso
+            if entry in in_use or entry.startswith('build-') or path == PIP_CACHE_DIR or not os.path.isdir(path):
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(entry)
+    return removed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m taskman.envs')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    requirements_parser = subparsers.add_parser('requirements', help='Muestra los requirements y el hash de un script')
+    requirements_parser.add_argument('script')
+    prepare_parser = subparsers.add_parser('prepare', help='Construye el entorno de los scripts si ha cambiado')
+    prepare_parser.add_argument('scripts', nargs='+')
+    subparsers.add_parser('prepare-all', help='Construye los entornos de todos los scripts')
+    subparsers.add_parser('gc', help='Borra entornos que no usa ningún script')
+    args = parser.parse_args(argv)
+
+    if args.command == 'requirements':
+        requirements = script_requirements(args.script)
+        print('\n'.join(requirements))
+        print(f'# hash: {requirements_hash(requirements)}')
+        return 0
+
+    if args.command == 'gc':
+        for entry in collect_garbage():
+            print(f'Eliminado entorno {entry}')
+        return 0
+
+    scripts = _all_scripts() if args.command == 'prepare-all' else args.scripts
+    status = 0
+    for script in scripts:
+        try:
+            print(f'{os.path.basename(script)}: {ensure_env(script)}')
+        except (OSError, SyntaxError, ValueError, RuntimeError, subprocess.CalledProcessError) as e:
+            print(f'{os.path.basename(script)}: error preparando el entorno: {e}', file=sys.stderr)
+            status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,272 @@
+"""Helpers compartidos para los scripts: variables de entorno, HTTP y base de datos.
+
+Uso desde un script:
+    from taskman.helpers import get_session, get_setting, db_connection
+
+    response = get_session().get('https://api.github.com')
+    with db_connection() as conn:
+        conn.cursor().execute('SELECT 1')
+
+Las variables se leen del fichero indicado por ENV_SCRIPTS_FILE
+(.env-scripts-test por defecto). Para DB_DRIVER=mssql se usa 'pyodbc', que
+taskman.envs instala en el entorno de los scripts que importan db_connection.
+"""
+
+import contextlib
+import os
+import queue
+import threading
+
+from taskman import BACKEND_DIR, SCRIPTS_DIR
+
+DEFAULT_ENV_FILE = '.env-scripts-test'
+DEFAULT_TIMEOUT = (5, 30)  # (conexión, lectura) en segundos
+MAX_RETRY_AFTER = 30  # Espera máxima (segundos) que se acepta de una cabecera Retry-After
+DEFAULT_ODBC_DRIVER = 'ODBC Driver 18 for SQL Server'
+
+_lock = threading.Lock()
+_env_cache = {}
+_session = None
+_pools = {}
+
+
+# --- Variables de entorno ---
+
+def resolve_env_file(env_file=None):
+    """Ruta absoluta del fichero de entorno de los scripts."""
+    env_file = env_file or os.environ.get('ENV_SCRIPTS_FILE', DEFAULT_ENV_FILE)
+    if os.path.isabs(env_file):
+        return env_file
+    path = os.path.normpath(os.path.join(BACKEND_DIR, env_file))
+    if not os.path.exists(path):
+        # El lanzador automático pasa la ruta relativa a /scripts ('../.env-scripts')
+        path = os.path.normpath(os.path.join(SCRIPTS_DIR, env_file))
+    return path
+
+
+def _parse_env(path):
+    values = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#') or '=' not in line:
+                continue
+            key, value = line.split('=', 1)
+            key = key.strip()
+            if key.startswith('export '):
+                key = key[len('export '):].strip()
+            value = value.strip()
+            if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'':
+                value = value[1:-1]
+            values[key] = value
+    return values
+
+
+def load_env(env_file=None):
+    """Devuelve las variables del fichero de entorno.
+
+    El resultado se cachea por ruta y solo se vuelve a leer si cambia la
+    fecha de modificación o el tamaño del fichero.
+    """
+    path = resolve_env_file(env_file)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return {}
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        cached = _env_cache.get(path)
+        if cached is None or cached[0] != key:
+            cached = (key, _parse_env(path))
+            _env_cache[path] = cached
+    return dict(cached[1])
+
+
+def get_setting(name, default=None, env_file=None):
+    """Valor de una variable: primero el entorno del proceso, luego el fichero."""
+    if name in os.environ:
+        return os.environ[name]
+    return load_env(env_file).get(name, default)
+
+
+def apply_env(env_file=None, override=False):
+    """Copia las variables del fichero a os.environ, como load_dotenv."""
+    for name, value in load_env(env_file).items():
+        if override or name not in os.environ:
+            os.environ[name] = value
+
+
+# --- HTTP ---
+
+def _create_session(timeout, retries, backoff_factor, pool_maxsize):
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    class TimeoutSession(requests.Session):
+        """Sesión que aplica un timeout por defecto a todas las peticiones."""
+
+        def request(self, method, url, **kwargs):
+            kwargs.setdefault('timeout', timeout)
+            return super().request(method, url, **kwargs)
+
+    class CappedRetry(Retry):
+        """Retry que no espera más de MAX_RETRY_AFTER aunque el servidor pida más."""
+
+        def get_retry_after(self, response):
+            retry_after = super().get_retry_after(response)
+            return None if retry_after is None else min(retry_after, MAX_RETRY_AFTER)
+
+    # raise_on_status=False: al agotar los reintentos se devuelve la última respuesta
+    retry = CappedRetry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=10, pool_maxsize=pool_maxsize)
+    session = TimeoutSession()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session(timeout=DEFAULT_TIMEOUT, retries=3, backoff_factor=0.5, pool_maxsize=10):
+    """Sesión HTTP compartida por todo el proceso.
+
+    Reutiliza conexiones (keep-alive) y reintenta con backoff exponencial los
+    errores de conexión y las respuestas 429/5xx de métodos idempotentes; si se
+    agotan los reintentos devuelve la última respuesta. Los parámetros solo se
+    tienen en cuenta al crear la sesión.
+    """
+    global _session
+    with _lock:
+        if _session is None:
+            _session = _create_session(timeout, retries, backoff_factor, pool_maxsize)
+        return _session
+
+
+def close_session():
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+# --- Base de datos ---
+
+class ConnectionPool:
+    """Pool sencillo de conexiones DB-API reutilizables."""
+
+    def __init__(self, connect, max_idle=5):
+        self._connect = connect
+        self._idle = queue.LifoQueue(maxsize=max_idle)
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def release(self, conn):
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def _db_settings(env_file):
+    return {
+        'driver': get_setting('DB_DRIVER', 'mssql', env_file).lower(),
+        'host': get_setting('DB_HOST', None, env_file),
+        'port': get_setting('DB_PORT', '1433', env_file),
+        'user': get_setting('DB_USER', None, env_file),
+        'password': get_setting('DB_PASS', None, env_file),
+        'database': get_setting('DB_NAME', None, env_file),
+        'odbc_driver': get_setting('DB_ODBC_DRIVER', DEFAULT_ODBC_DRIVER, env_file),
+        'pool_size': int(get_setting('DB_POOL_SIZE', '5', env_file)),
+    }
+
+
+def _odbc_value(value):
+    """Valor entre llaves para una cadena de conexión ODBC ('}' se escribe '}}')."""
+    return '{' + ('' if value is None else str(value)).replace('}', '}}') + '}'
+
+
+def _odbc_connection_string(settings):
+    attributes = {
+        'DRIVER': settings['odbc_driver'],
+        'SERVER': f"{settings['host']},{settings['port']}",
+        'DATABASE': settings['database'],
+        'UID': settings['user'],
+        'PWD': settings['password'],
+    }
+    quoted = ';'.join(f'{name}={_odbc_value(value)}' for name, value in attributes.items())
+    return quoted + ';Encrypt=yes;TrustServerCertificate=yes'
+
+
+def _connect_factory(settings):
+    if settings['driver'] == 'sqlite':
+        import sqlite3
+
+        # DB_NAME es la ruta del fichero SQLite (o ':memory:')
+        return lambda: sqlite3.connect(settings['database'], check_same_thread=False)
+
+    if settings['driver'] == 'mssql':
+        try:
+            import pyodbc
+        except ImportError:
+            raise RuntimeError("DB_DRIVER=mssql necesita el paquete 'pyodbc'") from None
+        connection_string = _odbc_connection_string(settings)
+        return lambda: pyodbc.connect(connection_string)
+
+    raise ValueError(f"DB_DRIVER no soportado: {settings['driver']}")
+
+
+def get_pool(env_file=None):
+    """Pool de conexiones para la configuración DB_* del fichero de entorno."""
+    settings = _db_settings(env_file)
+    key = tuple(sorted(settings.items()))
+    with _lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(_connect_factory(settings), max_idle=settings['pool_size'])
+            _pools[key] = pool
+        return pool
+
+
+@contextlib.contextmanager
+def db_connection(env_file=None):
+    """Presta una conexión del pool; hace commit al salir o rollback si hay error."""
+    pool = get_pool(env_file)
+    conn = pool.acquire()
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        try:
+            conn.rollback()
+        except Exception:
+            # Conexión rota: no se devuelve al pool
+            conn.close()
+            conn = None
+        raise
+    finally:
+        if conn is not None:
+            pool.release(conn)
+
+
+def close_pools():
+    with _lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
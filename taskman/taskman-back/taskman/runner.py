@@ -0,0 +1,213 @@
+"""Lanzador instrumentado de scripts de Taskman.
+
+Ejecuta un script en un proceso hijo y mide tiempo total, tiempo de CPU,
+memoria máxima (RSS), tiempo de imports y código de salida.
+
+Uso:
+    python -m taskman.runner run scripts/mi_script.py [--metrics-file metrics.json]
+    python -m taskman.runner report [--last 100] [--top 10] [--json]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from taskman import BACKEND_DIR
+
+HISTORY_FILE = os.path.join(BACKEND_DIR, 'metrics', 'history.jsonl')
+TRAILER_PREFIX = '[taskman-metrics]'
+
+
+def _wait_with_usage(proc):
+    """Espera al proceso y devuelve (exit_code, cpu_segundos, peak_rss_kb) solo de ese hijo."""
+    if not hasattr(os, 'wait4'):  # Windows
+        return proc.wait(), None, None
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    peak_rss = usage.ru_maxrss
+    # En macOS ru_maxrss viene en bytes, en Linux en KB
+    if sys.platform == 'darwin':
+        peak_rss //= 1024
+    return proc.returncode, usage.ru_utime + usage.ru_stime, peak_rss
+
+
+def run_script(script_path, python=None):
+    """Ejecuta un script y devuelve el registro de métricas de la ejecución.
+
+    Sin 'python' se usa el entorno cacheado del script (ver taskman.envs). Si
+    aún no existe no se instala nada aquí: envs.require_env lanza
+    EnvNotReadyError.
+    """
+    script_path = os.path.abspath(script_path)
+    if not python:
+        from taskman import envs
+
+        python = envs.require_env(script_path)
+    fd, import_time_file = tempfile.mkstemp(prefix='taskman-import-', suffix='.txt')
+    os.close(fd)
+
+    env = dict(os.environ)
+    # Permite 'import taskman' desde los scripts
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [BACKEND_DIR, env.get('PYTHONPATH')]))
+    cmd = [python, '-m', 'taskman._bootstrap', script_path, import_time_file]
+
+    started_at = datetime.datetime.now()
+    start = time.perf_counter()
+    try:
+        exit_code, cpu_time, peak_rss = _wait_with_usage(subprocess.Popen(cmd, env=env))
+        wall_time = time.perf_counter() - start
+        try:
+            with open(import_time_file) as f:
+                import_time = float(f.read() or 'nan')
+        except (OSError, ValueError):
+            import_time = None
+    finally:
+        os.remove(import_time_file)
+
+    def to_ms(seconds):
+        if seconds is None or seconds != seconds:
+            return None
+        return int(round(seconds * 1000))
+
+    return {
+        'script': os.path.basename(script_path),
+        'started_at': started_at.isoformat(timespec='seconds'),
+        'wall_time_ms': to_ms(wall_time),
+        'cpu_time_ms': to_ms(cpu_time),
+        'peak_rss_kb': peak_rss,
+        'import_time_ms': to_ms(import_time),
+        'exit_code': exit_code,
+    }
+
+
+def append_history(record, history_file=HISTORY_FILE):
+    os.makedirs(os.path.dirname(history_file), exist_ok=True)
+    with open(history_file, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record) + '\n')
+
+
+def load_history(last, history_file=HISTORY_FILE):
+    """Devuelve las últimas 'last' ejecuciones registradas."""
+    if last <= 0 or not os.path.exists(history_file):
+        return []
+    with open(history_file, encoding='utf-8') as f:
+        lines = [line for line in f if line.strip()]
+    records = []
+    for line in lines[-last:]:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            continue
+    return records
+
+
+def summarize(records):
+    """Agrupa las ejecuciones por script con medias y máximos."""
+    by_script = {}
+    for record in records:
+        by_script.setdefault(record['script'], []).append(record)
+
+    def values(runs, key):
+        return [r[key] for r in runs if r.get(key) is not None]
+
+    summary = []
+    for script, runs in by_script.items():
+        wall = values(runs, 'wall_time_ms')
+        cpu = values(runs, 'cpu_time_ms')
+        rss = values(runs, 'peak_rss_kb')
+        imports = values(runs, 'import_time_ms')
+        summary.append({
+            'script': script,
+            'runs': len(runs),
+            'errors': sum(1 for r in runs if r.get('exit_code') != 0),
+            'avg_wall_time_ms': int(sum(wall) / len(wall)) if wall else None,
+            'max_wall_time_ms': max(wall) if wall else None,
+            'avg_cpu_time_ms': int(sum(cpu) / len(cpu)) if cpu else None,
+            'avg_import_time_ms': int(sum(imports) / len(imports)) if imports else None,
+            'max_peak_rss_kb': max(rss) if rss else None,
+        })
+    return summary
+
+
+def _print_table(title, rows):
+    print(title)
+    header = f"{'script':<30} {'runs':>5} {'err':>4} {'avg ms':>9} {'max ms':>9} {'cpu ms':>9} {'imp ms':>8} {'rss KB':>9}"
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        cells = [row['avg_wall_time_ms'], row['max_wall_time_ms'], row['avg_cpu_time_ms'],
+                 row['avg_import_time_ms'], row['max_peak_rss_kb']]
+        cells = ['-' if c is None else c for c in cells]
+        print(f"{row['script']:<30} {row['runs']:>5} {row['errors']:>4} {cells[0]:>9} {cells[1]:>9} "
+              f"{cells[2]:>9} {cells[3]:>8} {cells[4]:>9}")
+    print()
+
+
+def report(last, top, as_json=False, history_file=HISTORY_FILE):
+    summary = summarize(load_history(last, history_file))
+    slowest = sorted(summary, key=lambda r: r['avg_wall_time_ms'] or 0, reverse=True)[:top]
+    heaviest = sorted(summary, key=lambda r: r['max_peak_rss_kb'] or 0, reverse=True)[:top]
+    if as_json:
+        print(json.dumps({'slowest': slowest, 'heaviest': heaviest}, indent=2))
+        return
+    if not summary:
+        print('No hay ejecuciones registradas.')
+        return
+    _print_table(f'Scripts más lentos (últimas {last} ejecuciones)', slowest)
+    _print_table(f'Scripts con más memoria (últimas {last} ejecuciones)', heaviest)
+
+
+def _positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f'debe ser un entero mayor que 0: {value}')
+    return number
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m taskman.runner')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Ejecuta un script registrando sus métricas')
+    run_parser.add_argument('script')
+    run_parser.add_argument('--metrics-file', help='Escribe las métricas en este JSON en vez de imprimirlas')
+    run_parser.add_argument('--python', help='Intérprete con el que lanzar el script (por defecto, su entorno cacheado)')
+    run_parser.add_argument('--history', default=HISTORY_FILE)
+
+    report_parser = subparsers.add_parser('report', help='Muestra los scripts más lentos y pesados')
+    report_parser.add_argument('--last', type=_positive_int, default=100, help='Número de ejecuciones a analizar')
+    report_parser.add_argument('--top', type=_positive_int, default=10)
+    report_parser.add_argument('--json', action='store_true')
+    report_parser.add_argument('--history', default=HISTORY_FILE)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'report':
+        report(args.last, args.top, args.json, args.history)
+        return 0
+
+    try:
+        record = run_script(args.script, args.python)
+    except (OSError, SyntaxError, ValueError, RuntimeError) as e:
+        print(f'Error preparando el entorno del script: {e}', file=sys.stderr)
+        return 1
+    try:
+        append_history(record, args.history)
+    except OSError as e:
+        print(f'No se pudo guardar el histórico de métricas: {e}', file=sys.stderr)
+    if args.metrics_file:
+        with open(args.metrics_file, 'w', encoding='utf-8') as f:
+            json.dump(record, f)
+    else:
+        sys.stdout.flush()
+        print(f'{TRAILER_PREFIX} {json.dumps(record)}')
+    return record['exit_code']
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Permite 'import taskman' al lanzar pytest desde /taskman-back o desde la raíz
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
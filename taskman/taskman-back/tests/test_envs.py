@@ -0,0 +1,155 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from taskman import envs, runner
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """Directorio de scripts, requirements fijados y .venvs aislados."""
+    scripts_dir = tmp_path / 'scripts'
+    scripts_dir.mkdir()
+    pinned = tmp_path / 'requirements.txt'
+    pinned.write_text('pandas==2.3.0\npython-dotenv==1.1.1\nRequests==2.32.4\npyodbc==5.2.0\n')
+    monkeypatch.setattr(envs, 'PINNED_REQUIREMENTS_FILE', str(pinned))
+    monkeypatch.setattr(envs, 'ENVS_DIR', str(tmp_path / '.venvs'))
+    monkeypatch.setattr(envs, 'PIP_CACHE_DIR', str(tmp_path / '.venvs' / 'pip-cache'))
+    monkeypatch.setattr(envs, 'SCRIPTS_DIR', str(scripts_dir))
+    return scripts_dir
+
+
+def write_script(scripts_dir, name, source):
+    path = scripts_dir / name
+    path.write_text(source)
+    return str(path)
+
+
+def test_script_requirements_from_imports(workspace):
+    write_script(workspace, 'utils.py', '')
+    script = write_script(workspace, 'job.py', (
+        'import os, json\n'
+        'import pandas as pd\n'
+        'from dotenv import load_dotenv\n'
+        'import yaml\n'
+        'import utils\n'
+        'from taskman.helpers import get_session\n'
+    ))
+    assert envs.script_requirements(script) == ['pandas==2.3.0', 'python-dotenv==1.1.1', 'PyYAML', 'Requests==2.32.4']
+
+
+def test_script_requirements_adds_pyodbc_for_db_helpers(workspace):
+    script = write_script(workspace, 'db.py', 'from taskman.helpers import db_connection\n')
+    assert envs.script_requirements(script) == ['pyodbc==5.2.0', 'Requests==2.32.4']
+
+
+def test_per_script_requirements_extend_derived_list(workspace):
+    script = write_script(workspace, 'job.py', 'import pandas\nimport requests\n')
+    (workspace / 'job.requirements.txt').write_text('pandas==2.2.0  # versión anterior\nlxml\n')
+    assert envs.script_requirements(script) == ['lxml', 'pandas==2.2.0', 'Requests==2.32.4']
+
+
+def test_script_requirements_honours_coding_cookie(workspace):
+    path = workspace / 'latin.py'
+    path.write_bytes('# -*- coding: latin-1 -*-\nimport yaml\nprint("año")\n'.encode('latin-1'))
+    assert envs.script_requirements(str(path)) == ['PyYAML']
+
+
+def test_requirements_hash_changes_only_with_requirements(workspace):
+    assert envs.requirements_hash(['a==1', 'b==2']) == envs.requirements_hash(['a==1', 'b==2'])
+    assert envs.requirements_hash(['a==1', 'b==2']) != envs.requirements_hash(['a==1', 'b==3'])
+
+
+def test_ensure_env_without_building(workspace):
+    stdlib_only = write_script(workspace, 'solo_stdlib.py', 'import json\n')
+    assert envs.ensure_env(stdlib_only, build=False) == sys.executable
+
+    script = write_script(workspace, 'job.py', 'import pandas\n')
+    assert envs.ensure_env(script, build=False) is None
+
+    env_dir = os.path.join(envs.ENVS_DIR, envs.requirements_hash(envs.script_requirements(script)))
+    os.makedirs(env_dir)
+    open(os.path.join(env_dir, envs.READY_MARKER), 'w').close()
+    assert envs.ensure_env(script, build=False) == envs._env_python(env_dir)
+
+
+def test_collect_garbage_keeps_live_envs_and_builds(workspace):
+    script = write_script(workspace, 'job.py', 'import pandas\n')
+    live = envs.requirements_hash(envs.script_requirements(script))
+    for entry in (live, 'deadbeefdeadbeef', 'build-abc123', 'pip-cache'):
+        os.makedirs(os.path.join(envs.ENVS_DIR, entry))
+
+    assert envs.collect_garbage() == ['deadbeefdeadbeef']
+    assert sorted(os.listdir(envs.ENVS_DIR)) == sorted([live, 'build-abc123', 'pip-cache'])
+
+
+def test_only_one_build_per_hash(workspace):
+    assert envs._acquire_lock('abc')
+    assert not envs._acquire_lock('abc')
+    envs._release_lock('abc')
+    assert envs._acquire_lock('abc')
+
+    # Un lock abandonado hace más de BUILD_LOCK_TIMEOUT se descarta
+    old = os.path.getmtime(envs._lock_path('abc')) - envs.BUILD_LOCK_TIMEOUT - 1
+    os.utime(envs._lock_path('abc'), (old, old))
+    assert envs._acquire_lock('abc')
+
+
+def test_require_env_spawns_a_single_build(workspace, monkeypatch):
+    script = write_script(workspace, 'job.py', 'import pandas\n')
+    env_hash = envs.requirements_hash(envs.script_requirements(script))
+    started = []
+    monkeypatch.setattr(envs, 'prepare_in_background', started.append)
+
+    with pytest.raises(envs.EnvNotReadyError, match='segundo plano'):
+        envs.require_env(script)
+    assert started == [script]
+
+    # Mientras la construcción tiene el lock no se lanza otra
+    assert envs._acquire_lock(env_hash)
+    for _ in range(3):
+        with pytest.raises(envs.EnvNotReadyError, match='segundo plano'):
+            envs.require_env(script)
+    assert started == [script]
+
+
+def test_failed_build_is_reported(workspace, monkeypatch):
+    script = write_script(workspace, 'job.py', 'import paquete_inexistente\n')
+
+    def failing_build(env_dir, requirements):
+        raise subprocess.CalledProcessError(1, ['pip'], output='ERROR: No matching distribution found for paquete_inexistente\n')
+
+    monkeypatch.setattr(envs, '_build_env', failing_build)
+    with pytest.raises(subprocess.CalledProcessError):
+        envs.ensure_env(script)
+    env_hash = envs.requirements_hash(envs.script_requirements(script))
+    assert not envs.is_building(env_hash)
+
+    started = []
+    monkeypatch.setattr(envs, 'prepare_in_background', started.append)
+    with pytest.raises(envs.EnvNotReadyError, match='No matching distribution'):
+        envs.require_env(script)
+    assert started == []
+
+    # Una construcción correcta borra el error
+    def fake_build(env_dir, requirements):
+        os.makedirs(env_dir)
+        open(os.path.join(env_dir, envs.READY_MARKER), 'w').close()
+
+    monkeypatch.setattr(envs, '_build_env', fake_build)
+    envs.ensure_env(script)
+    assert envs.build_error(env_hash) is None
+    assert envs.require_env(script) == envs._env_python(os.path.join(envs.ENVS_DIR, env_hash))
+
+
+def test_run_fails_fast_when_env_not_ready(workspace, monkeypatch):
+    script = write_script(workspace, 'job.py', 'import pandas\n')
+    started = []
+    monkeypatch.setattr(envs, 'prepare_in_background', started.append)
+    monkeypatch.setattr(envs, '_build_env', lambda *args: pytest.fail('no debe instalar al ejecutar'))
+
+    with pytest.raises(envs.EnvNotReadyError):
+        runner.run_script(script)
+    assert started == [script]
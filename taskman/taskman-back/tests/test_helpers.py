@@ -0,0 +1,193 @@
+import http.server
+import os
+import sqlite3
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+requests = pytest.importorskip('requests')
+
+from taskman import helpers  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def reset_helpers(monkeypatch):
+    for name in ('ENV_SCRIPTS_FILE', 'DB_DRIVER', 'DB_HOST', 'DB_PORT', 'DB_USER', 'DB_PASS', 'DB_NAME', 'DB_POOL_SIZE'):
+        monkeypatch.delenv(name, raising=False)
+    helpers._env_cache.clear()
+    yield
+    helpers.close_session()
+    helpers.close_pools()
+    helpers._env_cache.clear()
+
+
+@pytest.fixture
+def server():
+    """Servidor HTTP local que responde con los estados de 'statuses' (200 al agotarse)."""
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            state['hits'] += 1
+            state['clients'].add(self.client_address)
+            if self.path == '/slow':
+                time.sleep(1)
+            status = state['statuses'].pop(0) if state['statuses'] else 200
+            self.send_response(status)
+            for name, value in state['headers'].items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', '2')
+            self.end_headers()
+            self.wfile.write(b'ok')
+
+        def log_message(self, *args):
+            pass
+
+    state = {'hits': 0, 'clients': set(), 'statuses': [], 'headers': {}}
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    state['url'] = f'http://127.0.0.1:{httpd.server_port}'
+    yield state
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_session_is_shared_and_reuses_connections(server):
+    session = helpers.get_session()
+    assert helpers.get_session() is session
+    for _ in range(5):
+        assert session.get(server['url']).status_code == 200
+    assert server['hits'] == 5
+    assert len(server['clients']) == 1
+
+
+def test_session_applies_default_timeout(server):
+    session = helpers.get_session(timeout=(1, 0.2), retries=0)
+    start = time.perf_counter()
+    with pytest.raises(requests.exceptions.RequestException):
+        session.get(server['url'] + '/slow')
+    assert time.perf_counter() - start < 1
+
+
+def test_session_retries_after_503(server):
+    server['statuses'] = [503]
+    response = helpers.get_session(backoff_factor=0).get(server['url'])
+    assert response.status_code == 200
+    assert server['hits'] == 2
+
+
+def test_session_returns_last_response_when_retries_run_out(server):
+    server['statuses'] = [503, 503, 503]
+    response = helpers.get_session(retries=2, backoff_factor=0).get(server['url'])
+    assert response.status_code == 503
+    assert server['hits'] == 3
+
+
+def test_session_caps_retry_after(server, monkeypatch):
+    monkeypatch.setattr(helpers, 'MAX_RETRY_AFTER', 0.1)
+    server['statuses'] = [503]
+    server['headers'] = {'Retry-After': '3600'}
+    start = time.perf_counter()
+    response = helpers.get_session(backoff_factor=0).get(server['url'])
+    assert response.status_code == 200
+    assert time.perf_counter() - start < 2
+
+
+def test_load_env_reparses_only_when_file_changes(tmp_path, monkeypatch):
+    env_file = tmp_path / '.env-scripts'
+    env_file.write_text('# comentario\nDB_HOST=host1\nQUOTED="con espacios"\nCUSTOM:ignorada\n')
+    calls = []
+    parse_env = helpers._parse_env
+    monkeypatch.setattr(helpers, '_parse_env', lambda path: calls.append(path) or parse_env(path))
+
+    assert helpers.load_env(str(env_file)) == {'DB_HOST': 'host1', 'QUOTED': 'con espacios'}
+    helpers.load_env(str(env_file))
+    assert len(calls) == 1
+
+    # Mismo tamaño, distinta fecha de modificación
+    stat = env_file.stat()
+    env_file.write_text(env_file.read_text().replace('host1', 'host2'))
+    os.utime(env_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert helpers.load_env(str(env_file))['DB_HOST'] == 'host2'
+    assert len(calls) == 2
+
+    # Distinto tamaño, misma fecha de modificación
+    stat = env_file.stat()
+    env_file.write_text(env_file.read_text() + 'NEW=1\n')
+    os.utime(env_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert helpers.load_env(str(env_file))['NEW'] == '1'
+    assert len(calls) == 3
+
+
+def test_get_setting_prefers_process_environment(tmp_path, monkeypatch):
+    env_file = tmp_path / '.env-scripts'
+    env_file.write_text('DB_HOST=fromFile\nDB_USER=usuario\n')
+    monkeypatch.setenv('DB_HOST', 'fromProcess')
+    assert helpers.get_setting('DB_HOST', env_file=str(env_file)) == 'fromProcess'
+    assert helpers.get_setting('DB_USER', env_file=str(env_file)) == 'usuario'
+    assert helpers.get_setting('MISSING', 'default', env_file=str(env_file)) == 'default'
+
+
+@pytest.fixture
+def sqlite_env(tmp_path):
+    db_path = tmp_path / 'taskman.db'
+    env_file = tmp_path / '.env-scripts-test'
+    env_file.write_text(f'DB_DRIVER=sqlite\nDB_NAME={db_path}\n')
+    with sqlite3.connect(db_path) as conn:
+        conn.execute('CREATE TABLE items (name TEXT)')
+    return str(env_file), str(db_path)
+
+
+def _count_items(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute('SELECT COUNT(*) FROM items').fetchone()[0]
+
+
+def test_db_connection_reuses_pooled_connections(sqlite_env):
+    env_file, _ = sqlite_env
+    with helpers.db_connection(env_file) as first:
+        pass
+    with helpers.db_connection(env_file) as second:
+        assert second is first
+        # Mientras está prestada, otra petición recibe una conexión nueva
+        with helpers.db_connection(env_file) as third:
+            assert third is not first
+
+
+def test_db_connection_commits_on_success(sqlite_env):
+    env_file, db_path = sqlite_env
+    with helpers.db_connection(env_file) as conn:
+        conn.execute("INSERT INTO items VALUES ('ok')")
+    assert _count_items(db_path) == 1
+
+
+def test_db_connection_rolls_back_on_error(sqlite_env):
+    env_file, db_path = sqlite_env
+    with pytest.raises(ValueError):
+        with helpers.db_connection(env_file) as conn:
+            conn.execute("INSERT INTO items VALUES ('ko')")
+            raise ValueError('fallo')
+    assert _count_items(db_path) == 0
+    # La conexión vuelve al pool y sigue siendo usable
+    with helpers.db_connection(env_file) as again:
+        assert again is conn
+        again.execute("INSERT INTO items VALUES ('ok')")
+    assert _count_items(db_path) == 1
+
+
+def test_mssql_connection_string_quotes_values(tmp_path, monkeypatch):
+    env_file = tmp_path / '.env-scripts'
+    env_file.write_text('DB_HOST=sqlserver.example.com\nDB_USER=admin\nDB_PASS=a;b}c\nDB_NAME=Task;man\n')
+    connected = []
+    monkeypatch.setitem(sys.modules, 'pyodbc', types.SimpleNamespace(connect=connected.append))
+
+    helpers.get_pool(str(env_file)).acquire()
+    assert connected == [
+        'DRIVER={ODBC Driver 18 for SQL Server};SERVER={sqlserver.example.com,1433};DATABASE={Task;man};'
+        'UID={admin};PWD={a;b}}c};Encrypt=yes;TrustServerCertificate=yes'
+    ]
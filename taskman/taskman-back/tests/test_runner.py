@@ -0,0 +1,77 @@
+import json
+import os
+import sys
+
+import pytest
+
+from taskman import runner
+
+
+@pytest.fixture
+def script(tmp_path):
+    """Script que importa un módulo lento (0.2 s) de su propio directorio."""
+    (tmp_path / 'slowmod.py').write_text('import time\ntime.sleep(0.2)\n')
+    path = tmp_path / 'script.py'
+    path.write_text('import sys\nimport slowmod\nprint("hola")\nsys.exit(3)\n')
+    return str(path)
+
+
+def test_run_script_records_metrics(script, capfd):
+    record = runner.run_script(script, python=sys.executable)
+    assert capfd.readouterr().out == 'hola\n'
+    assert record['script'] == 'script.py'
+    assert record['exit_code'] == 3
+    assert record['wall_time_ms'] >= 200
+    assert record['import_time_ms'] >= 200
+    if hasattr(os, 'wait4'):
+        assert record['cpu_time_ms'] is not None
+        assert record['peak_rss_kb'] > 0
+
+
+def test_main_writes_sidecar_and_history(script, tmp_path):
+    metrics_file = tmp_path / 'metrics.json'
+    history_file = tmp_path / 'history.jsonl'
+    exit_code = runner.main([
+        'run', script, '--python', sys.executable,
+        '--metrics-file', str(metrics_file), '--history', str(history_file),
+    ])
+    assert exit_code == 3
+    record = json.loads(metrics_file.read_text())
+    assert runner.load_history(10, str(history_file)) == [record]
+
+
+def test_report_lists_slowest_and_heaviest(tmp_path, capsys):
+    history_file = str(tmp_path / 'history.jsonl')
+    runs = [
+        ('rapido.py', 100, 20000, 0),
+        ('lento.py', 900, 10000, 0),
+        ('lento.py', 1100, 12000, 1),
+        ('pesado.py', 300, 90000, 0),
+    ]
+    for script, wall, rss, exit_code in runs:
+        runner.append_history({
+            'script': script, 'wall_time_ms': wall, 'cpu_time_ms': wall,
+            'peak_rss_kb': rss, 'import_time_ms': 10, 'exit_code': exit_code,
+        }, history_file)
+
+    runner.report(last=10, top=1, as_json=True, history_file=history_file)
+    result = json.loads(capsys.readouterr().out)
+    assert [row['script'] for row in result['slowest']] == ['lento.py']
+    assert result['slowest'][0]['avg_wall_time_ms'] == 1000
+    assert result['slowest'][0]['errors'] == 1
+    assert [row['script'] for row in result['heaviest']] == ['pesado.py']
+
+    # Solo se analizan las últimas N ejecuciones
+    runner.report(last=1, top=5, as_json=True, history_file=history_file)
+    result = json.loads(capsys.readouterr().out)
+    assert [row['script'] for row in result['slowest']] == ['pesado.py']
+
+
+def test_report_rejects_non_positive_last(tmp_path, capsys):
+    history_file = str(tmp_path / 'history.jsonl')
+    runner.append_history({'script': 'a.py', 'wall_time_ms': 1, 'exit_code': 0}, history_file)
+    assert runner.load_history(0, history_file) == []
+    assert runner.load_history(-1, history_file) == []
+    with pytest.raises(SystemExit):
+        runner.main(['report', '--last', '0', '--history', history_file])
+    assert 'mayor que 0' in capsys.readouterr().err
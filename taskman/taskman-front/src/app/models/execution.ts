@@ -6,4 +6,9 @@ export interface ExecutionModel {
   Log: string;
   ScriptName: string;
   ScheduledTime: string;
+  WallTimeMs?: number | null;
+  CpuTimeMs?: number | null;
+  PeakRssKb?: number | null;
+  ImportTimeMs?: number | null;
+  ExitCode?: number | null;
 }